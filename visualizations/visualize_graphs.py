@@ -3,265 +3,637 @@ NetworkX Graph Visualizations for Spotify DSA Project
 Visualizes all graph structures used in the recommendation engine
 """
 
+import importlib.util
+import os
+
 import networkx as nx
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.lines import Line2D
 import pandas as pd
 import numpy as np
+from scipy import sparse
+from scipy.optimize import minimize
+from scipy.spatial import cKDTree
 from collections import defaultdict
 
+try:
+    import numba
+except ImportError:  # Optional: JIT kernels for large user sets
+    numba = None
+
+try:
+    import igraph as ig
+except ImportError:  # Optional: C graph layout for the user graphs
+    ig = None
+
 # Configuration
 plt.style.use('seaborn-v0_8-darkgrid')
 FIGSIZE = (16, 12)
+DPI = 150
+LABEL_CAP = 100  # Graphs with more nodes are drawn without labels
+LARGE_GRAPH_NODES = 500  # Above this, layouts switch to L-BFGS
+SPARSE_JACCARD_MAX_NNZ = 50_000_000  # Above this many estimated M @ M.T entries, Jaccard uses the Numba kernel
+PAIR_BLOCK_ENTRIES = 1 << 22  # Per-row match buffer size (entries) for the Numba kernels
+SIMILARITY_GRAPH_THRESHOLD = 0.2  # Minimum Jaccard for a user similarity edge
+COMMUNITY_THRESHOLD = 0.3  # Minimum Jaccard for joining a taste community
+
+# Column schemas for each dataset (only the columns the visualizers read)
+DATASET_SCHEMAS = {
+    'songs': {'song_id': 'str', 'title': 'str', 'genre': 'str',
+              'energy': 'float64', 'danceability': 'float64'},
+    'artists': {'artist_id': 'str', 'artist_name': 'str'},
+    'users': {'user_id': 'str'},
+    'user_song_interactions': {'user_id': 'str', 'song_id': 'str',
+                               'liked': 'bool', 'play_count': 'int32'},
+    'user_artist_interactions': {'user_id': 'str', 'artist_id': 'str',
+                                 'play_count': 'int32'},
+}
+
+# Use the multithreaded pyarrow CSV parser and Parquet cache when pyarrow is installed
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+CSV_ENGINE = 'pyarrow' if HAVE_PYARROW else 'c'
+
+def read_dataset(base_path, name):
+    """
+    Read one dataset with its explicit column schema
+    The parsed CSV is cached next to it as Parquet and reused until the CSV changes
+    """
+    schema = DATASET_SCHEMAS[name]
+    csv_path = base_path + name + '.csv'
+    parquet_path = base_path + name + '.parquet'
+
+    if HAVE_PYARROW and os.path.exists(parquet_path) \
+            and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+        try:
+            return pd.read_parquet(parquet_path, engine='pyarrow',
+                                   columns=list(schema), memory_map=True)
+        except (OSError, ValueError, KeyError):
+            pass  # Stale or unreadable cache: re-parse the CSV below
+
+    df = pd.read_csv(csv_path, usecols=list(schema), dtype=schema, engine=CSV_ENGINE)
+
+    if HAVE_PYARROW:
+        try:
+            df.to_parquet(parquet_path, engine='pyarrow', compression='zstd', index=False)
+        except OSError:
+            pass  # Read-only dataset directory: skip caching
+
+    return df
 
 def load_datasets(base_path='../backend/datasets/'):
     """Load all CSV datasets"""
-    songs = pd.read_csv(base_path + 'songs.csv')
-    artists = pd.read_csv(base_path + 'artists.csv')
-    users = pd.read_csv(base_path + 'users.csv')
-    user_song_int = pd.read_csv(base_path + 'user_song_interactions.csv')
-    user_artist_int = pd.read_csv(base_path + 'user_artist_interactions.csv')
+    songs = read_dataset(base_path, 'songs')
+    artists = read_dataset(base_path, 'artists')
+    users = read_dataset(base_path, 'users')
+    user_song_int = read_dataset(base_path, 'user_song_interactions')
+    user_artist_int = read_dataset(base_path, 'user_artist_interactions')
 
     return songs, artists, users, user_song_int, user_artist_int
 
-def visualize_user_song_bipartite(users, songs, user_song_int, max_users=10, max_songs=20):
+def encode_ids(songs, artists, users, user_song_int, user_artist_int):
+    """
+    Replace user/song/artist ID columns in place with compact int32 codes
+    Users, songs and artists take consecutive code ranges, so codes never
+    collide in the bipartite graphs; within a range codes follow file order
+    Returns an array of original IDs indexed by code, for labelling
+    """
+    tables = {
+        'user_id': [users, user_song_int, user_artist_int],
+        'song_id': [songs, user_song_int],
+        'artist_id': [artists, user_artist_int],
+    }
+    id_labels = []
+    offset = 0
+    for column, frames in tables.items():
+        codes, labels = pd.factorize(pd.concat([df[column] for df in frames], ignore_index=True))
+        codes = (codes + offset).astype(np.int32)
+        start = 0
+        for df in frames:
+            df[column] = codes[start:start + len(df)]
+            start += len(df)
+        id_labels.append(np.asarray(labels, dtype=object))
+        offset += len(labels)
+    return np.concatenate(id_labels)
+
+def draw_nodes(pos, nodes, **kwargs):
+    """Draw nodes as a single rasterized scatter collection above the edges"""
+    xy = np.array([pos[node] for node in nodes], dtype=float).reshape(-1, 2)
+    return plt.scatter(xy[:, 0], xy[:, 1], rasterized=True, zorder=2, **kwargs)
+
+def draw_edges(pos, edges, widths, color, alpha):
+    """Draw edges as a single rasterized LineCollection beneath the nodes"""
+    segments = np.array([(pos[u], pos[v]) for u, v in edges], dtype=float).reshape(-1, 2, 2)
+    lines = LineCollection(segments, linewidths=widths, colors=color, alpha=alpha, zorder=1)
+    lines.set_rasterized(True)
+    ax = plt.gca()
+    ax.add_collection(lines)
+    ax.autoscale_view()
+    return lines
+
+def draw_labels(pos, labels, fontsize, color='black'):
+    """Draw node labels as plain text artists sharing one font; skipped above LABEL_CAP nodes"""
+    if len(labels) > LABEL_CAP:
+        return
+    ax = plt.gca()
+    font = FontProperties(size=fontsize, weight='bold')
+    for node, text in labels.items():
+        x, y = pos[node]
+        ax.text(x, y, text, fontproperties=font, color=color,
+                ha='center', va='center', clip_on=True)
+
+def bipartite_columns(left_nodes, right_nodes, left_spacing, right_spacing):
+    """Position one node set in a column at x=0 and the other at x=3"""
+    pos = {node: (0, i * left_spacing) for i, node in enumerate(left_nodes)}
+    pos.update({node: (3, i * right_spacing) for i, node in enumerate(right_nodes)})
+    return pos
+
+def visualize_user_song_bipartite(users, songs, user_song_int, id_labels, max_users=10, max_songs=20):
     """
     Visualizes User-Song Bipartite Graph
     Two distinct node sets: Users and Songs
     """
     print("\n[1] Creating User-Song Bipartite Graph...")
 
+    title_map = dict(zip(songs['song_id'].tolist(), songs['title'].tolist()))
+
     # Create bipartite graph
     B = nx.Graph()
 
     # Filter to first N users for clarity
-    user_ids = users['user_id'].head(max_users).tolist()
-    filtered_interactions = user_song_int[user_song_int['user_id'].isin(user_ids)]
+    user_ids = pd.Index(users['user_id'].head(max_users))
+    mask = user_song_int['user_id'].isin(user_ids)
 
     # Get top songs from these users
-    top_songs = filtered_interactions['song_id'].value_counts().head(max_songs).index.tolist()
-    filtered_interactions = filtered_interactions[filtered_interactions['song_id'].isin(top_songs)]
+    top_songs = pd.Index(user_song_int.loc[mask, 'song_id'].value_counts().head(max_songs).index)
+
+    # Only show liked songs among the top songs
+    mask &= user_song_int['liked'] & user_song_int['song_id'].isin(top_songs)
+    liked_df = user_song_int.loc[mask, ['user_id', 'song_id', 'play_count']]
 
     # Add nodes with bipartite attribute
     B.add_nodes_from(user_ids, bipartite=0)
     B.add_nodes_from(top_songs, bipartite=1)
 
     # Add edges with weights (play_count)
-    for _, row in filtered_interactions.iterrows():
-        if row['liked']:  # Only show liked songs
-            B.add_edge(row['user_id'], row['song_id'], weight=row['play_count'])
+    edges = list(zip(liked_df['user_id'].tolist(), liked_df['song_id'].tolist()))
+    weights = liked_df['play_count'].to_numpy()
+    B.add_weighted_edges_from((u, v, w) for (u, v), w in zip(edges, weights))
 
-    # Create layout
-    pos = {}
-
-    # Position users on the left
+    # Create layout: users on the left, songs on the right
     user_nodes = [n for n in B.nodes() if n in user_ids]
-    for i, node in enumerate(user_nodes):
-        pos[node] = (0, i * 2)
-
-    # Position songs on the right
     song_nodes = [n for n in B.nodes() if n in top_songs]
-    for i, node in enumerate(song_nodes):
-        pos[node] = (3, i * 1.5)
+    pos = bipartite_columns(user_nodes, song_nodes, left_spacing=2, right_spacing=1.5)
 
     # Draw graph
     plt.figure(figsize=FIGSIZE)
 
     # Draw nodes
-    nx.draw_networkx_nodes(B, pos, nodelist=user_nodes,
-                          node_color='lightblue', node_size=1500,
-                          label='Users', alpha=0.9)
-    nx.draw_networkx_nodes(B, pos, nodelist=song_nodes,
-                          node_color='lightcoral', node_size=1200,
-                          label='Songs', alpha=0.9)
+    draw_nodes(pos, user_nodes, c='lightblue', s=1500, label='Users', alpha=0.9)
+    draw_nodes(pos, song_nodes, c='lightcoral', s=1200, label='Songs', alpha=0.9)
 
     # Draw edges with varying thickness based on play count
-    edges = B.edges()
-    weights = [B[u][v]['weight'] for u, v in edges]
-    max_weight = max(weights) if weights else 1
-    widths = [3 * (w / max_weight) for w in weights]
+    max_weight = weights.max() if len(weights) else 1
+    widths = 3 * (weights / max_weight)
 
-    nx.draw_networkx_edges(B, pos, width=widths, alpha=0.3, edge_color='gray')
+    draw_edges(pos, edges, widths, color='gray', alpha=0.3)
 
     # Labels
     labels = {}
     for node in user_nodes:
-        labels[node] = node
+        labels[node] = id_labels[node]
     for node in song_nodes:
-        song_title = songs[songs['song_id'] == node]['title'].values
-        if len(song_title) > 0:
-            title = song_title[0][:15] + '...' if len(song_title[0]) > 15 else song_title[0]
-            labels[node] = title
+        title = title_map.get(node)
+        if title is not None:
+            labels[node] = title[:15] + '...' if len(title) > 15 else title
         else:
-            labels[node] = node
+            labels[node] = id_labels[node]
 
-    nx.draw_networkx_labels(B, pos, labels, font_size=8, font_weight='bold')
+    draw_labels(pos, labels, fontsize=8)
 
     plt.title('User-Song Bipartite Graph\n(Users on left, Songs on right)',
               fontsize=16, fontweight='bold')
     plt.legend(fontsize=12)
     plt.axis('off')
     plt.tight_layout()
-    plt.savefig('user_song_bipartite.png', dpi=300, bbox_inches='tight')
+    plt.savefig('user_song_bipartite.png', dpi=DPI, bbox_inches='tight')
     print("   ✓ Saved: user_song_bipartite.png")
     plt.close()
 
-def calculate_jaccard_similarity(set1, set2):
-    """Calculate Jaccard similarity between two sets"""
-    if len(set1) == 0 and len(set2) == 0:
-        return 0.0
-    intersection = len(set1.intersection(set2))
-    union = len(set1.union(set2))
-    return intersection / union if union > 0 else 0.0
+def liked_song_matrix(liked):
+    """
+    Build a sparse boolean user x song matrix of liked songs
+    Returns (user_ids, M) where row r of M belongs to user_ids[r]
+    """
+    user_idx, user_ids = pd.factorize(liked['user_id'])
+    song_idx, song_ids = pd.factorize(liked['song_id'])
 
-def visualize_user_similarity_graph(users, user_song_int, min_similarity=0.2):
+    M = sparse.csr_matrix((np.ones(len(liked), dtype=np.int32), (user_idx, song_idx)),
+                          shape=(len(user_ids), len(song_ids)))
+    M.data[:] = 1  # Collapse duplicate (user, song) rows
+
+    return np.asarray(user_ids), M
+
+def cooccurrence_nnz(M):
     """
-    Visualizes User-User Weighted Similarity Graph
-    Edge weights represent Jaccard similarity
+    Upper bound on the nonzeros of M @ M.T: each song contributes one entry
+    per ordered pair of users who liked it, users_per_song ** 2 in total
     """
-    print("\n[2] Creating User-User Similarity Weighted Graph...")
+    users_per_song = np.bincount(M.indices, minlength=M.shape[1]).astype(np.int64)
+    return int(np.sum(users_per_song ** 2))
 
-    G = nx.Graph()
+def calculate_cooccurring_jaccard(M):
+    """
+    Calculate Jaccard similarity for every pair of rows of M sharing a song
+    |A & B| comes from the upper triangle of the sparse product M @ M.T, so
+    work and memory scale with co-occurring pairs instead of N x N, whatever
+    the user count; calculate_jaccard_pairs() takes this path whenever
+    cooccurrence_nnz(M) is within SPARSE_JACCARD_MAX_NNZ
+    Returns (i, j, sim) arrays with i < j
+    """
+    intersection = sparse.triu(M @ M.T, k=1).tocoo()
+    i, j, shared = intersection.row, intersection.col, intersection.data
+    sizes = np.diff(M.indptr)
+    sim = shared / (sizes[i] + sizes[j] - shared)
+
+    return i, j, sim
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _sorted_jaccard(indptr, indices, a, b):
+        """Two-pointer Jaccard over the sorted song indices of rows a and b"""
+        p, p_end = indptr[a], indptr[a + 1]
+        q, q_end = indptr[b], indptr[b + 1]
+        intersection = 0
+        while p < p_end and q < q_end:
+            if indices[p] == indices[q]:
+                intersection += 1
+                p += 1
+                q += 1
+            elif indices[p] < indices[q]:
+                p += 1
+            else:
+                q += 1
+        union = (p_end - indptr[a]) + (q_end - indptr[b]) - intersection
+        return intersection / union if union > 0 else 0.0
+
+    @numba.njit(cache=True)
+    def _popcount64(x):
+        """SWAR popcount of a uint64 (LLVM lowers this to the popcnt instruction)"""
+        x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+        x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+    @numba.njit(cache=True)
+    def _bitset_jaccard(bits, a, b):
+        """Jaccard of two packed liked-song bitsets via popcount of AND / OR"""
+        intersection = 0
+        union = 0
+        for w in range(bits.shape[1]):
+            intersection += _popcount64(bits[a, w] & bits[b, w])
+            union += _popcount64(bits[a, w] | bits[b, w])
+        return intersection / union if union > 0 else 0.0
+
+    @numba.njit(cache=True)
+    def _pair_jaccard(indptr, indices, bits, a, b):
+        """Jaccard of rows a and b from their packed bitsets if given, else their sorted CSR indices"""
+        if bits.shape[1] > 0:
+            return _bitset_jaccard(bits, a, b)
+        return _sorted_jaccard(indptr, indices, a, b)
+
+    @numba.njit(parallel=True, cache=True)
+    def _jaccard_pairs_kernel(indptr, indices, bits, min_similarity):
+        """
+        All (i, j, sim) with i < j, sim > 0 and sim >= min_similarity over the CSR rows,
+        scored from packed bitsets when bits has any words (see _pair_jaccard)
+        """
+        n = len(indptr) - 1
+        block = max(1, PAIR_BLOCK_ENTRIES // max(n, 1))
+
+        # Each block of rows collects its matches into per-row buffers in one
+        # parallel pass, then they are compacted into that block's output
+        match_cols = np.empty((block, n), dtype=np.int64)
+        match_sims = np.empty((block, n), dtype=np.float64)
+        counts = np.empty(block, dtype=np.int64)
+        row_chunks, col_chunks, sim_chunks = [], [], []
+
+        for start in range(0, n, block):
+            rows_in_block = min(block, n - start)
+            for r in numba.prange(rows_in_block):
+                a = start + r
+                found = 0
+                for b in range(a + 1, n):
+                    sim = _pair_jaccard(indptr, indices, bits, a, b)
+                    # Pairs sharing no songs are skipped as on the sparse path
+                    if sim > 0 and sim >= min_similarity:
+                        match_cols[r, found] = b
+                        match_sims[r, found] = sim
+                        found += 1
+                counts[r] = found
+
+            offsets = np.zeros(rows_in_block + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(counts[:rows_in_block])
+            rows = np.empty(offsets[-1], dtype=np.int64)
+            cols = np.empty(offsets[-1], dtype=np.int64)
+            sims = np.empty(offsets[-1], dtype=np.float64)
+            for r in numba.prange(rows_in_block):
+                out = offsets[r]
+                found = counts[r]
+                rows[out:out + found] = start + r
+                cols[out:out + found] = match_cols[r, :found]
+                sims[out:out + found] = match_sims[r, :found]
+            row_chunks.append(rows)
+            col_chunks.append(cols)
+            sim_chunks.append(sims)
+
+        total = 0
+        for rows in row_chunks:
+            total += len(rows)
+        all_rows = np.empty(total, dtype=np.int64)
+        all_cols = np.empty(total, dtype=np.int64)
+        all_sims = np.empty(total, dtype=np.float64)
+        out = 0
+        for c in range(len(row_chunks)):
+            found = len(row_chunks[c])
+            all_rows[out:out + found] = row_chunks[c]
+            all_cols[out:out + found] = col_chunks[c]
+            all_sims[out:out + found] = sim_chunks[c]
+            out += found
+
+        return all_rows, all_cols, all_sims
+
+    @numba.njit(cache=True)
+    def _union_find_roots(n, rows, cols):
+        """Union-Find (path compression + union by rank) over edges; returns each node's root"""
+        parent = np.arange(n)
+        rank = np.zeros(n, dtype=np.int32)
+
+        for e in range(len(rows)):
+            x, y = rows[e], cols[e]
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            while parent[y] != y:
+                parent[y] = parent[parent[y]]
+                y = parent[y]
+            if x == y:
+                continue
+            if rank[x] < rank[y]:
+                x, y = y, x
+            parent[y] = x
+            if rank[x] == rank[y]:
+                rank[x] += 1
+
+        roots = np.empty(n, dtype=np.int64)
+        for v in range(n):
+            root = v
+            while parent[root] != root:
+                root = parent[root]
+            roots[v] = root
+        return roots
+
+def bitset_words(n_songs):
+    """Number of uint64 words in a bitset over n_songs songs"""
+    return (n_songs + 63) // 64
+
+def pack_liked_bitsets(M):
+    """Pack each row of the user x song matrix into a uint64 bitset of ceil(S / 64) words"""
+    coo = M.tocoo()
+    bits = np.zeros((M.shape[0], bitset_words(M.shape[1])), dtype=np.uint64)
+    np.bitwise_or.at(bits, (coo.row, coo.col // 64),
+                     np.left_shift(np.uint64(1), (coo.col % 64).astype(np.uint64)))
+    return bits
+
+def calculate_jaccard_pairs(liked, min_similarity):
+    """
+    Find user pairs whose liked-song Jaccard similarity is at least min_similarity
+    Returns (user_ids, (i, j, sim), min_similarity) with i < j indexing into
+    user_ids; the threshold travels with the pairs so later filters can check it
+    Pairs sharing no songs have similarity 0 and are never returned, even
+    when min_similarity <= 0
+    When M @ M.T would be too large to materialize, a Numba kernel checks
+    every pair instead and only emits those above the threshold: packed
+    bitsets when liked sets are dense, sorted-index merging otherwise
+    """
+    user_ids, M = liked_song_matrix(liked)
 
-    # Build user liked songs sets
-    user_liked = defaultdict(set)
-    for _, row in user_song_int[user_song_int['liked'] == True].iterrows():
-        user_liked[row['user_id']].add(row['song_id'])
+    if numba is not None and cooccurrence_nnz(M) > SPARSE_JACCARD_MAX_NNZ:
+        M.sort_indices()
+        if bitset_words(M.shape[1]) <= 2 * M.nnz / M.shape[0]:
+            bits = pack_liked_bitsets(M)
+        else:
+            bits = np.zeros((M.shape[0], 0), dtype=np.uint64)
+        i, j, sim = _jaccard_pairs_kernel(M.indptr, M.indices, bits, min_similarity)
+    else:
+        i, j, sim = similar_user_pairs(calculate_cooccurring_jaccard(M), min_similarity)
+
+    return user_ids, (i, j, sim), min_similarity
 
-    user_ids = list(user_liked.keys())
-    G.add_nodes_from(user_ids)
+def similar_user_pairs(pairs, min_similarity, pairs_threshold=None):
+    """
+    Restrict (i, j, sim) user pairs to those at or above the threshold
+    pairs_threshold is the threshold the pairs were computed at; filtering
+    below it would silently miss pairs, so it raises instead
+    """
+    if pairs_threshold is not None and min_similarity < pairs_threshold:
+        raise ValueError(f"min_similarity={min_similarity} is below the {pairs_threshold} "
+                         f"the user pairs were computed at")
+    i, j, sim = pairs
+    keep = sim >= min_similarity
+    return i[keep], j[keep], sim[keep]
+
+def fruchterman_reingold_lbfgs(G, k, maxiter=50, n_neighbors=20, seed=None):
+    """
+    Fruchterman-Reingold layout minimized with L-BFGS
+    Attraction runs over the weighted edges, repulsion over each node's
+    nearest neighbours (re-queried from a KD-tree on every evaluation)
+    """
+    nodes = list(G)
+    n = len(nodes)
+    A = sparse.triu(nx.to_scipy_sparse_array(G, nodelist=nodes, weight='weight'), k=1).tocoo()
+    src, dst, w = A.row, A.col, A.data
+    n_neighbors = min(n_neighbors, n - 1)
+
+    def energy_and_grad(x):
+        xy = x.reshape(n, 2)
+        grad = np.zeros_like(xy)
+
+        # Attraction: w * d^3 / (3k) per edge
+        delta = xy[src] - xy[dst]
+        dist = np.maximum(np.linalg.norm(delta, axis=1), 1e-9)
+        energy = np.sum(w * dist ** 3) / (3 * k)
+        force = (w * dist / k)[:, None] * delta
+        np.add.at(grad, src, force)
+        np.subtract.at(grad, dst, force)
+
+        # Repulsion: -k^2 * ln(d) per nearest-neighbour pair
+        _, nbrs = cKDTree(xy).query(xy, k=n_neighbors + 1)
+        # Each unordered neighbour pair once, whether or not it is mutual
+        pairs = np.c_[np.repeat(np.arange(n), n_neighbors), nbrs[:, 1:].ravel()]
+        rows, cols = np.unique(np.sort(pairs, axis=1), axis=0).T
+        delta = xy[rows] - xy[cols]
+        dist_sq = np.maximum(np.sum(delta ** 2, axis=1), 1e-18)
+        energy -= k ** 2 * 0.5 * np.sum(np.log(dist_sq))
+        force = (k ** 2 / dist_sq)[:, None] * delta
+        np.subtract.at(grad, rows, force)
+        np.add.at(grad, cols, force)
+
+        return energy, grad.ravel()
+
+    rng = np.random.default_rng(seed)
+    x0 = rng.random(2 * n) * k * np.sqrt(n)
+    res = minimize(energy_and_grad, x0, jac=True, method='L-BFGS-B',
+                   options={'maxiter': maxiter})
+
+    coords = nx.rescale_layout(res.x.reshape(n, 2))
+    return dict(zip(nodes, coords))
+
+def graph_layout(G, k, seed=42):
+    """Spring layout for small graphs, L-BFGS Fruchterman-Reingold for large ones"""
+    if len(G) > LARGE_GRAPH_NODES:
+        return fruchterman_reingold_lbfgs(G, k=k, seed=seed)
+    return nx.spring_layout(G, k=k, iterations=50, seed=seed)
+
+def user_graph_layout(user_ids, i, j, weights, k, seed=42):
+    """
+    Lay out the user graph over user_ids with (i, j, weight) edges indexing
+    into it. Large graphs use igraph's C Fruchterman-Reingold when igraph is
+    installed, everything else goes through graph_layout()
+    """
+    if ig is None or len(user_ids) <= LARGE_GRAPH_NODES:
+        G = nx.Graph()
+        G.add_nodes_from(user_ids.tolist())
+        G.add_weighted_edges_from(zip(user_ids[i].tolist(), user_ids[j].tolist(), weights.tolist()))
+        return graph_layout(G, k=k, seed=seed)
+
+    g = ig.Graph(n=len(user_ids), edges=list(zip(i.tolist(), j.tolist())),
+                 edge_attrs={'weight': weights.tolist()})
+    rng = np.random.default_rng(seed)
+    layout = g.layout_fruchterman_reingold(weights='weight',
+                                           seed=rng.random((len(user_ids), 2)).tolist())
+    coords = nx.rescale_layout(np.array(layout.coords))
+    return dict(zip(user_ids.tolist(), coords))
+
+def visualize_user_similarity_graph(user_ids, pairs, pairs_threshold, id_labels,
+                                    min_similarity=SIMILARITY_GRAPH_THRESHOLD):
+    """
+    Visualizes User-User Weighted Similarity Graph
+    Edge weights represent Jaccard similarity
+    """
+    print("\n[2] Creating User-User Similarity Weighted Graph...")
 
-    # Calculate similarities and add edges
-    similarities = []
-    for i, user1 in enumerate(user_ids):
-        for user2 in user_ids[i+1:]:
-            similarity = calculate_jaccard_similarity(user_liked[user1], user_liked[user2])
-            if similarity >= min_similarity:
-                G.add_edge(user1, user2, weight=similarity)
-                similarities.append(similarity)
+    # Edges between sufficiently similar users
+    i, j, similarities = similar_user_pairs(pairs, min_similarity, pairs_threshold)
+    edges = list(zip(user_ids[i].tolist(), user_ids[j].tolist()))
 
     if len(similarities) == 0:
         print("   ⚠ No similarities found above threshold. Skipping visualization.")
         return
 
     # Layout
-    pos = nx.spring_layout(G, k=2, iterations=50, seed=42)
+    pos = user_graph_layout(user_ids, i, j, similarities, k=2, seed=42)
 
     plt.figure(figsize=FIGSIZE)
 
     # Node colors based on degree (connectivity)
-    degrees = dict(G.degree())
-    node_colors = [degrees.get(node, 0) for node in G.nodes()]
+    node_colors = np.bincount(np.concatenate([i, j]), minlength=len(user_ids))
 
     # Draw nodes
-    nodes = nx.draw_networkx_nodes(G, pos, node_color=node_colors,
-                                   node_size=800, cmap='YlOrRd',
-                                   vmin=0, alpha=0.9)
+    nodes = draw_nodes(pos, user_ids, c=node_colors, s=800, cmap='YlOrRd',
+                       vmin=0, alpha=0.9)
 
     # Draw edges with thickness based on similarity
-    edges = G.edges()
-    weights = [G[u][v]['weight'] for u, v in edges]
-    widths = [5 * w for w in weights]
+    widths = 5 * similarities
 
-    nx.draw_networkx_edges(G, pos, width=widths, alpha=0.4, edge_color='gray')
+    draw_edges(pos, edges, widths, color='gray', alpha=0.4)
 
     # Labels
-    nx.draw_networkx_labels(G, pos, font_size=9, font_weight='bold')
+    draw_labels(pos, {user: id_labels[user] for user in user_ids}, fontsize=9)
 
     plt.title('User-User Similarity Weighted Graph\n(Edge thickness = Jaccard similarity)',
               fontsize=16, fontweight='bold')
 
     # Colorbar
-    sm = plt.cm.ScalarMappable(cmap='YlOrRd',
-                               norm=plt.Normalize(vmin=0, vmax=max(node_colors)))
-    sm.set_array([])
-    cbar = plt.colorbar(sm, label='Node Degree (Connections)')
+    cbar = plt.colorbar(nodes, label='Node Degree (Connections)')
 
     plt.axis('off')
     plt.tight_layout()
-    plt.savefig('user_similarity_graph.png', dpi=300, bbox_inches='tight')
+    plt.savefig('user_similarity_graph.png', dpi=DPI, bbox_inches='tight')
     print("   ✓ Saved: user_similarity_graph.png")
     plt.close()
 
-def visualize_user_artist_bipartite(users, artists, user_artist_int, max_users=12, max_artists=15):
+def visualize_user_artist_bipartite(users, artists, user_artist_int, id_labels, max_users=12, max_artists=15):
     """
     Visualizes User-Artist Bipartite Graph
     Edge weights represent normalized play counts
     """
     print("\n[3] Creating User-Artist Bipartite Graph...")
 
+    name_map = dict(zip(artists['artist_id'].tolist(), artists['artist_name'].tolist()))
+
     B = nx.Graph()
 
     # Filter data
-    user_ids = users['user_id'].head(max_users).tolist()
-    filtered_int = user_artist_int[user_artist_int['user_id'].isin(user_ids)]
+    user_ids = pd.Index(users['user_id'].head(max_users))
+    mask = user_artist_int['user_id'].isin(user_ids)
 
     # Get top artists
-    top_artists = filtered_int['artist_id'].value_counts().head(max_artists).index.tolist()
-    filtered_int = filtered_int[filtered_int['artist_id'].isin(top_artists)]
+    top_artists = pd.Index(user_artist_int.loc[mask, 'artist_id'].value_counts().head(max_artists).index)
+    mask &= user_artist_int['artist_id'].isin(top_artists)
+    filtered_int = user_artist_int.loc[mask, ['user_id', 'artist_id', 'play_count']]
 
     # Normalize play counts per user
-    max_plays = filtered_int.groupby('user_id')['play_count'].max().to_dict()
+    filtered_int['norm'] = (filtered_int['play_count']
+                            / filtered_int.groupby('user_id')['play_count'].transform('max'))
 
     # Add nodes
     B.add_nodes_from(user_ids, bipartite=0)
     B.add_nodes_from(top_artists, bipartite=1)
 
     # Add edges
-    for _, row in filtered_int.iterrows():
-        normalized_weight = row['play_count'] / max_plays.get(row['user_id'], 1)
-        B.add_edge(row['user_id'], row['artist_id'], weight=normalized_weight)
+    edges = list(zip(filtered_int['user_id'].tolist(), filtered_int['artist_id'].tolist()))
+    weights = filtered_int['norm'].to_numpy()
+    B.add_weighted_edges_from((u, v, w) for (u, v), w in zip(edges, weights))
 
     # Layout
-    pos = {}
     user_nodes = [n for n in B.nodes() if n in user_ids]
     artist_nodes = [n for n in B.nodes() if n in top_artists]
-
-    for i, node in enumerate(user_nodes):
-        pos[node] = (0, i * 2)
-
-    for i, node in enumerate(artist_nodes):
-        pos[node] = (3, i * 2)
+    pos = bipartite_columns(user_nodes, artist_nodes, left_spacing=2, right_spacing=2)
 
     plt.figure(figsize=FIGSIZE)
 
     # Draw nodes
-    nx.draw_networkx_nodes(B, pos, nodelist=user_nodes,
-                          node_color='skyblue', node_size=1500,
-                          label='Users', alpha=0.9)
-    nx.draw_networkx_nodes(B, pos, nodelist=artist_nodes,
-                          node_color='lightgreen', node_size=1500,
-                          label='Artists', alpha=0.9)
+    draw_nodes(pos, user_nodes, c='skyblue', s=1500, label='Users', alpha=0.9)
+    draw_nodes(pos, artist_nodes, c='lightgreen', s=1500, label='Artists', alpha=0.9)
 
     # Draw edges
-    edges = B.edges()
-    weights = [B[u][v]['weight'] for u, v in edges]
-    widths = [4 * w for w in weights]
+    widths = 4 * weights
 
-    nx.draw_networkx_edges(B, pos, width=widths, alpha=0.3, edge_color='purple')
+    draw_edges(pos, edges, widths, color='purple', alpha=0.3)
 
     # Labels
     labels = {}
     for node in user_nodes:
-        labels[node] = node
+        labels[node] = id_labels[node]
     for node in artist_nodes:
-        artist_name = artists[artists['artist_id'] == node]['artist_name'].values
-        if len(artist_name) > 0:
-            labels[node] = artist_name[0][:12]
-        else:
-            labels[node] = node
+        artist_name = name_map.get(node)
+        labels[node] = artist_name[:12] if artist_name is not None else id_labels[node]
 
-    nx.draw_networkx_labels(B, pos, labels, font_size=9, font_weight='bold')
+    draw_labels(pos, labels, fontsize=9)
 
     plt.title('User-Artist Bipartite Graph\n(Edge thickness = Normalized play count)',
               fontsize=16, fontweight='bold')
     plt.legend(fontsize=12)
     plt.axis('off')
     plt.tight_layout()
-    plt.savefig('user_artist_bipartite.png', dpi=300, bbox_inches='tight')
+    plt.savefig('user_artist_bipartite.png', dpi=DPI, bbox_inches='tight')
     print("   ✓ Saved: user_artist_bipartite.png")
     plt.close()
 
-def visualize_taste_communities(users, user_song_int, min_similarity=0.3):
+def visualize_taste_communities(user_ids, pairs, pairs_threshold, id_labels,
+                                min_similarity=COMMUNITY_THRESHOLD):
     """
     Visualizes Taste Communities formed by Union-Find
     Different colors represent different communities
@@ -270,56 +642,54 @@ def visualize_taste_communities(users, user_song_int, min_similarity=0.3):
 
     # Simulate Union-Find clustering
     class UnionFind:
-        def __init__(self):
-            self.parent = {}
-
-        def make_set(self, x):
-            if x not in self.parent:
-                self.parent[x] = x
+        """Array-backed disjoint sets over integer ids 0..n-1"""
+        def __init__(self, n):
+            self.parent = np.arange(n)
+            self.rank = np.zeros(n, dtype=np.int32)
 
         def find(self, x):
-            if self.parent[x] != x:
-                self.parent[x] = self.find(self.parent[x])
-            return self.parent[x]
+            parent = self.parent
+            root = x
+            while parent[root] != root:
+                root = parent[root]
+            # Path compression
+            while parent[x] != root:
+                parent[x], x = root, parent[x]
+            return root
 
         def union(self, x, y):
             root_x = self.find(x)
             root_y = self.find(y)
-            if root_x != root_y:
-                self.parent[root_x] = root_y
-
-    G = nx.Graph()
-    uf = UnionFind()
-
-    # Build user liked songs sets
-    user_liked = defaultdict(set)
-    for _, row in user_song_int[user_song_int['liked'] == True].iterrows():
-        user_liked[row['user_id']].add(row['song_id'])
-
-    user_ids = list(user_liked.keys())
-
-    for user in user_ids:
-        uf.make_set(user)
-        G.add_node(user)
-
-    # Calculate similarities and union similar users
-    for i, user1 in enumerate(user_ids):
-        for user2 in user_ids[i+1:]:
-            similarity = calculate_jaccard_similarity(user_liked[user1], user_liked[user2])
-            if similarity >= min_similarity:
-                G.add_edge(user1, user2, weight=similarity)
-                uf.union(user1, user2)
+            if root_x == root_y:
+                return
+            # Union by rank
+            if self.rank[root_x] < self.rank[root_y]:
+                root_x, root_y = root_y, root_x
+            self.parent[root_y] = root_x
+            if self.rank[root_x] == self.rank[root_y]:
+                self.rank[root_x] += 1
+
+    # Union similar users
+    i, j, weights = similar_user_pairs(pairs, min_similarity, pairs_threshold)
+    edges = list(zip(user_ids[i].tolist(), user_ids[j].tolist()))
+
+    if numba is not None:
+        roots = _union_find_roots(len(user_ids), i, j)
+    else:
+        uf = UnionFind(len(user_ids))
+        for a, b in zip(i.tolist(), j.tolist()):
+            uf.union(a, b)
+        roots = [uf.find(idx) for idx in range(len(user_ids))]
 
     # Assign community IDs
     communities = defaultdict(list)
-    for user in user_ids:
-        root = uf.find(user)
+    for user, root in zip(user_ids, roots):
         communities[root].append(user)
 
     print(f"   Found {len(communities)} communities")
 
     # Layout
-    pos = nx.spring_layout(G, k=2.5, iterations=50, seed=42)
+    pos = user_graph_layout(user_ids, i, j, weights, k=2.5, seed=42)
 
     plt.figure(figsize=FIGSIZE)
 
@@ -332,27 +702,25 @@ def visualize_taste_communities(users, user_song_int, min_similarity=0.3):
         for member in members:
             community_colors[member] = color
 
-    node_colors = [community_colors[node] for node in G.nodes()]
+    node_colors = [community_colors[node] for node in user_ids]
 
     # Draw nodes
-    nx.draw_networkx_nodes(G, pos, node_color=node_colors,
-                          node_size=1000, alpha=0.9, edgecolors='black', linewidths=2)
+    draw_nodes(pos, user_ids, c=node_colors, s=1000, alpha=0.9,
+               edgecolors='black', linewidths=2)
 
     # Draw edges
-    edges = G.edges()
-    weights = [G[u][v]['weight'] for u, v in edges]
-    widths = [3 * w for w in weights]
+    widths = 3 * weights
 
-    nx.draw_networkx_edges(G, pos, width=widths, alpha=0.3, edge_color='gray')
+    draw_edges(pos, edges, widths, color='gray', alpha=0.3)
 
     # Labels
-    nx.draw_networkx_labels(G, pos, font_size=9, font_weight='bold', font_color='white')
+    draw_labels(pos, {user: id_labels[user] for user in user_ids}, fontsize=9, color='white')
 
     plt.title(f'Taste Communities (Union-Find)\n{len(communities)} communities formed',
               fontsize=16, fontweight='bold')
     plt.axis('off')
     plt.tight_layout()
-    plt.savefig('taste_communities.png', dpi=300, bbox_inches='tight')
+    plt.savefig('taste_communities.png', dpi=DPI, bbox_inches='tight')
     print("   ✓ Saved: taste_communities.png")
     plt.close()
 
@@ -366,21 +734,27 @@ def visualize_kdtree_2d_projection(songs):
     plt.figure(figsize=(14, 10))
 
     # Create scatter plot colored by genre
-    genres = songs['genre'].unique()
+    codes, genres = pd.factorize(songs['genre'])
     colors = plt.cm.tab10(np.linspace(0, 1, len(genres)))
-    genre_colors = {genre: colors[i] for i, genre in enumerate(genres)}
+    has_genre = codes >= 0  # factorize codes missing genres as -1
 
-    for genre in genres:
-        genre_songs = songs[songs['genre'] == genre]
-        plt.scatter(genre_songs['energy'], genre_songs['danceability'],
-                   label=genre, alpha=0.7, s=150,
-                   c=[genre_colors[genre]], edgecolors='black', linewidths=1)
+    plt.scatter(songs['energy'].to_numpy()[has_genre], songs['danceability'].to_numpy()[has_genre],
+               alpha=0.7, s=150, c=colors[codes[has_genre]], edgecolors='black', linewidths=1,
+               rasterized=True)
+
+    # One legend entry per genre
+    legend_handles = [Line2D([], [], marker='o', linestyle='', markersize=np.sqrt(150),
+                             markerfacecolor=color, markeredgecolor='black', alpha=0.7,
+                             label=genre)
+                      for genre, color in zip(genres, colors)]
 
     # Add some song labels for clarity
     sample_songs = songs.sample(min(15, len(songs)), random_state=42)
-    for _, song in sample_songs.iterrows():
-        plt.annotate(song['title'][:15],
-                    (song['energy'], song['danceability']),
+    for title, energy, danceability in zip(sample_songs['title'].to_numpy(),
+                                           sample_songs['energy'].to_numpy(),
+                                           sample_songs['danceability'].to_numpy()):
+        plt.annotate(title[:15],
+                    (energy, danceability),
                     fontsize=7, alpha=0.7,
                     xytext=(5, 5), textcoords='offset points')
 
@@ -388,10 +762,10 @@ def visualize_kdtree_2d_projection(songs):
     plt.ylabel('Danceability', fontsize=14, fontweight='bold')
     plt.title('K-D Tree Song Space (2D Projection)\nEnergy vs Danceability colored by Genre',
               fontsize=16, fontweight='bold')
-    plt.legend(fontsize=10, loc='best')
+    plt.legend(handles=legend_handles, fontsize=10, loc='best')
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig('kdtree_2d_projection.png', dpi=300, bbox_inches='tight')
+    plt.savefig('kdtree_2d_projection.png', dpi=DPI, bbox_inches='tight')
     print("   ✓ Saved: kdtree_2d_projection.png")
     plt.close()
 
@@ -407,14 +781,23 @@ def main():
         songs, artists, users, user_song_int, user_artist_int = load_datasets()
         print(f"✓ Loaded: {len(songs)} songs, {len(artists)} artists, {len(users)} users")
 
+        # Graphs are keyed by integer codes; original IDs are only used for labels
+        id_labels = encode_ids(songs, artists, users, user_song_int, user_artist_int)
+
         # Create visualizations
         print("\nGenerating visualizations...")
         print("-" * 70)
 
-        visualize_user_song_bipartite(users, songs, user_song_int)
-        visualize_user_similarity_graph(users, user_song_int)
-        visualize_user_artist_bipartite(users, artists, user_artist_int)
-        visualize_taste_communities(users, user_song_int)
+        # Liked-song similarity is shared by the similarity and community graphs,
+        # computed at the lowest threshold either of them uses
+        liked = user_song_int[user_song_int['liked']]
+        user_ids, pairs, pairs_threshold = calculate_jaccard_pairs(
+            liked, min_similarity=min(SIMILARITY_GRAPH_THRESHOLD, COMMUNITY_THRESHOLD))
+
+        visualize_user_song_bipartite(users, songs, user_song_int, id_labels)
+        visualize_user_similarity_graph(user_ids, pairs, pairs_threshold, id_labels)
+        visualize_user_artist_bipartite(users, artists, user_artist_int, id_labels)
+        visualize_taste_communities(user_ids, pairs, pairs_threshold, id_labels)
         visualize_kdtree_2d_projection(songs)
 
         print("\n" + "=" * 70)